@@ -4,6 +4,10 @@ from datetime import datetime
 import os
 import hashlib
 import json
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict, namedtuple
 
 def make_hashed_password(password):
     """Create hashed password"""
@@ -13,87 +17,154 @@ def check_password(password, hashed_password):
     """Verify password"""
     return make_hashed_password(password) == hashed_password
 
-def load_users():
-    """Load user data with persistence"""
-    try:
-        default_username = st.secrets["DEFAULT_USERNAME"]
-        if not os.path.exists('users.json'):
-            # Create default user
-            default_users = {
-                default_username: make_hashed_password(st.secrets["DEFAULT_PASSWORD"])
-            }
-            with open('users.json', 'w') as f:
-                json.dump(default_users, f)
-            
-            # Initialize default user's data files if they don't exist
-            if not os.path.exists(get_user_file(default_username)):
-                empty_bets = pd.DataFrame(columns=[
-                    'Date', 'Sport', 'Match', 'Bet Type', 'Stake', 'Odds', 'Result', 'Profit/Loss'
-                ])
-                save_data(empty_bets, default_username)
-            
-            if not os.path.exists(get_user_transactions_file(default_username)):
-                empty_transactions = pd.DataFrame(columns=[
-                    'Date', 'Type', 'Amount', 'Balance_After', 'Note'
-                ])
-                save_transactions(empty_transactions, default_username)
-            
-            if not os.path.exists(get_user_bankroll_file(default_username)):
-                save_user_bankroll(default_username, 0)  # or whatever initial bankroll you want
-                
-        with open('users.json', 'r') as f:
-            return json.load(f)
-    except Exception:
-        # If anything fails, return default user
-        return {st.secrets["DEFAULT_USERNAME"]: make_hashed_password(st.secrets["DEFAULT_PASSWORD"])}
+# Users are stored one directory each, sharded by a hash of the username, so
+# looking up or adding a user never reads the other users.
+USER_DATA_DIR = 'user_data'
 
-def save_users(users):
-    """Save user data"""
-    try:
-        with open('users.json', 'w') as f:
-            json.dump(users, f)
-    except Exception as e:
-        st.error(f"Error saving users: {e}")
+def get_user_dir(username):
+    """Get the data directory for a user"""
+    key = hashlib.sha256(str.encode(username)).hexdigest()
+    return os.path.join(USER_DATA_DIR, key[:2], key)
+
+def get_user_profile_file(username):
+    """Get filename for user's login details"""
+    return os.path.join(get_user_dir(username), 'profile.json')
 
 def get_user_file(username):
     """Get filename for user's betting data"""
-    return f'betting_data_{username}.csv'
+    return os.path.join(get_user_dir(username), 'betting_data.csv')
 
 def get_user_bankroll_file(username):
     """Get filename for user's bankroll"""
-    return f'bankroll_{username}.json'
+    return os.path.join(get_user_dir(username), 'bankroll.json')
 
 def get_user_transactions_file(username):
     """Get filename for user's transactions"""
-    return f'transactions_{username}.csv'
+    return os.path.join(get_user_dir(username), 'transactions.csv')
 
-def load_data(username):
-    """Load betting data for specific user"""
+def get_user_password(username):
+    """Get user's hashed password, or None if the user doesn't exist"""
     try:
-        filename = get_user_file(username)
+        filename = get_user_profile_file(username)
         if os.path.exists(filename):
-            df = pd.read_csv(filename)
-            df['Date'] = pd.to_datetime(df['Date'])
-            return df
-        return pd.DataFrame(columns=[
+            with open(filename, 'r') as f:
+                return json.load(f)['password']
+        return None
+    except Exception:
+        # If anything fails, still let the default user in
+        if username == st.secrets["DEFAULT_USERNAME"]:
+            return make_hashed_password(st.secrets["DEFAULT_PASSWORD"])
+        return None
+
+def register_user(username, hashed_password):
+    """Add a user. Returns False if the username is already taken.
+
+    Raises OSError if the profile can't be written.
+    """
+    user_dir = get_user_dir(username)
+    os.makedirs(user_dir, exist_ok=True)
+    # Write the whole profile to a temp file, then publish it with a hard link,
+    # which fails if the profile exists. A profile is never seen half-written.
+    fd, temp_file = tempfile.mkstemp(dir=user_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'username': username, 'password': hashed_password}, f)
+        os.link(temp_file, get_user_profile_file(username))
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(temp_file)
+
+def init_user_data(username, initial_bankroll=0):
+    """Create empty data files for a new user"""
+    if not os.path.exists(get_user_file(username)):
+        empty_bets = pd.DataFrame(columns=[
             'Date', 'Sport', 'Match', 'Bet Type', 'Stake', 'Odds', 'Result', 'Profit/Loss'
         ])
-    except Exception as e:
-        st.error(f"Error loading data: {e}")
-        return pd.DataFrame(columns=[
-            'Date', 'Sport', 'Match', 'Bet Type', 'Stake', 'Odds', 'Result', 'Profit/Loss'
+        save_data(empty_bets, username)
+    
+    if not os.path.exists(get_user_transactions_file(username)):
+        empty_transactions = pd.DataFrame(columns=[
+            'Date', 'Type', 'Amount', 'Balance_After', 'Note'
         ])
+        save_transactions(empty_transactions, username)
+    
+    if not os.path.exists(get_user_bankroll_file(username)):
+        save_user_bankroll(username, initial_bankroll)
+
+def migrate_legacy_users():
+    """Move users from users.json and their flat data files into user directories"""
+    if not os.path.exists('users.json'):
+        return
+    with open('users.json', 'r') as f:
+        users = json.load(f)
+    for username, hashed_password in users.items():
+        register_user(username, hashed_password)
+        legacy_files = {
+            f'betting_data_{username}.csv': get_user_file(username),
+            f'transactions_{username}.csv': get_user_transactions_file(username),
+            f'bankroll_{username}.json': get_user_bankroll_file(username)
+        }
+        for legacy_file, new_file in legacy_files.items():
+            if os.path.exists(legacy_file) and not os.path.exists(new_file):
+                os.replace(legacy_file, new_file)
+    os.replace('users.json', 'users.json.migrated')
+
+@st.cache_resource(show_spinner=False)
+def prepare_user_registry():
+    """Migrate legacy users and create the default user, once per process"""
+    try:
+        migrate_legacy_users()
+    except Exception as e:
+        st.error(f"Error migrating users: {e}")
+    try:
+        default_username = st.secrets["DEFAULT_USERNAME"]
+        if register_user(default_username, make_hashed_password(st.secrets["DEFAULT_PASSWORD"])):
+            init_user_data(default_username, 0)  # or whatever initial bankroll you want
+    except Exception:
+        pass
+
+def new_row_id():
+    """Get a new id for a bet or transaction"""
+    return uuid.uuid4().hex
+
+def set_row_ids(df):
+    """Use the saved Id column as the index.
+
+    Files saved before ids were stored use row positions, which stay the
+    same until the file is next saved with them.
+    """
+    if 'Id' in df.columns:
+        return df.set_index('Id').rename_axis(None)
+    return df.set_axis(df.index.astype(str))
+
+def load_data(username):
+    """Load betting data for specific user.
+
+    Raises if the file can't be read, so a failed read is never mistaken
+    for having no bets.
+    """
+    filename = get_user_file(username)
+    if os.path.exists(filename):
+        df = set_row_ids(pd.read_csv(filename, dtype={'Id': str}))
+        df['Date'] = pd.to_datetime(df['Date'])
+        return df
+    return pd.DataFrame(columns=[
+        'Date', 'Sport', 'Match', 'Bet Type', 'Stake', 'Odds', 'Result', 'Profit/Loss'
+    ])
 
 def save_data(df, username):
     """Save betting data"""
     try:
         filename = get_user_file(username)
-        df_to_save = df.copy()
-        if not df_to_save.empty:
-            df_to_save['Date'] = pd.to_datetime(df_to_save['Date']).dt.strftime('%Y-%m-%d')
-        df_to_save.to_csv(filename, index=False)
+        if not df.empty and not pd.api.types.is_datetime64_any_dtype(df['Date']):
+            df = df.assign(Date=pd.to_datetime(df['Date']))
+        df.to_csv(filename, index_label='Id', date_format='%Y-%m-%d')
+        return True
     except Exception as e:
         st.error(f"Error saving data: {e}")
+        return False
 
 def get_user_bankroll(username):
     """Load user's bankroll data"""
@@ -118,37 +189,558 @@ def save_user_bankroll(username, amount):
         bankrolls[username] = amount
         with open(filename, 'w') as f:
             json.dump(bankrolls, f)
+        return True
     except Exception as e:
         st.error(f"Error saving bankroll: {e}")
+        return False
 
 def load_transactions(username):
-    """Load transaction history for user"""
-    try:
-        filename = get_user_transactions_file(username)
-        if os.path.exists(filename):
-            df = pd.read_csv(filename)
-            df['Date'] = pd.to_datetime(df['Date'])
-            return df
-        return pd.DataFrame(columns=[
-            'Date', 'Type', 'Amount', 'Balance_After', 'Note'
-        ])
-    except Exception as e:
-        st.error(f"Error loading transactions: {e}")
-        return pd.DataFrame(columns=[
-            'Date', 'Type', 'Amount', 'Balance_After', 'Note'
-        ])
+    """Load transaction history for user.
+
+    Raises if the file can't be read, so a failed read is never mistaken
+    for having no transactions.
+    """
+    filename = get_user_transactions_file(username)
+    if os.path.exists(filename):
+        df = set_row_ids(pd.read_csv(filename, dtype={'Id': str}))
+        df['Date'] = pd.to_datetime(df['Date'])
+        return df
+    return pd.DataFrame(columns=[
+        'Date', 'Type', 'Amount', 'Balance_After', 'Note'
+    ])
 
 def save_transactions(df, username):
     """Save transaction history"""
     try:
         filename = get_user_transactions_file(username)
-        df_to_save = df.copy()
-        if not df_to_save.empty:
-            df_to_save['Date'] = pd.to_datetime(df_to_save['Date']).dt.strftime('%Y-%m-%d %H:%M:%S')
-        df_to_save.to_csv(filename, index=False)
+        if not df.empty and not pd.api.types.is_datetime64_any_dtype(df['Date']):
+            df = df.assign(Date=pd.to_datetime(df['Date']))
+        df.to_csv(filename, index_label='Id', date_format='%Y-%m-%d %H:%M:%S')
+        return True
     except Exception as e:
         st.error(f"Error saving transactions: {e}")
-        
+        return False
+
+# Settled bets and transactions from past months are compacted into one
+# archive file per month, with a summary of each kept in archive/summary.json.
+# Only pending bets and the current month are loaded at login.
+ARCHIVE_DATE_FORMATS = {
+    'bets': '%Y-%m-%d',
+    'transactions': '%Y-%m-%d %H:%M:%S'
+}
+# Archive months kept in memory per user; older ones are read again when needed
+ARCHIVE_CACHE_MONTHS = 6
+
+def get_current_month():
+    """Get the partition key for this month"""
+    return datetime.now().strftime('%Y-%m')
+
+def get_months(df):
+    """Get the partition key (YYYY-MM) of each row"""
+    return pd.to_datetime(df['Date']).dt.strftime('%Y-%m')
+
+def get_user_archive_file(username, kind, month):
+    """Get filename for one month of user's archived bets or transactions"""
+    return os.path.join(get_user_dir(username), 'archive', f'{kind}_{month}.csv')
+
+def get_user_archive_summary_file(username):
+    """Get filename for user's archive summaries"""
+    return os.path.join(get_user_dir(username), 'archive', 'summary.json')
+
+def load_archive_partition(username, kind, month):
+    """Load one month of archived bets or transactions.
+
+    Raises if the file can't be read, so a failed read is never mistaken
+    for an empty month.
+    """
+    df = set_row_ids(pd.read_csv(get_user_archive_file(username, kind, month), dtype={'Id': str}))
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+def save_archive_partition(df, username, kind, month):
+    """Save one month of archived bets or transactions"""
+    try:
+        filename = get_user_archive_file(username, kind, month)
+        if df.empty:
+            if os.path.exists(filename):
+                os.remove(filename)
+            return True
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        df.to_csv(filename, index_label='Id', date_format=ARCHIVE_DATE_FORMATS[kind])
+        return True
+    except Exception as e:
+        st.error(f"Error saving archive {kind} {month}: {e}")
+        return False
+
+def load_archive_summary(username):
+    """Load per-month summaries of user's archive.
+
+    Raises if the file can't be read, so a failed read is never mistaken
+    for an empty archive.
+    """
+    filename = get_user_archive_summary_file(username)
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            return json.load(f)
+    return {'bets': {}, 'transactions': {}}
+
+def save_archive_summary(summary, username):
+    """Save per-month summaries of user's archive"""
+    try:
+        filename = get_user_archive_summary_file(username)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Replace the file in one step so a crash never leaves it half-written
+        fd, temp_file = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(summary, f)
+            os.replace(temp_file, filename)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        return True
+    except Exception as e:
+        st.error(f"Error saving archive summary: {e}")
+        return False
+
+def summarize_bets(df):
+    """Summarize bets for the Summary Statistics"""
+    completed_bets = df[df['Result'] != 'Pending']
+    sports = {}
+    for sport, group in completed_bets.groupby('Sport'):
+        sports[sport] = {
+            'count': int(len(group)),
+            'wins': int((group['Result'] == 'Win').sum()),
+            'profit': float(group['Profit/Loss'].sum())
+        }
+    return {
+        'count': int(len(df)),
+        'stake': float(completed_bets['Stake'].sum()),
+        'profit': float(completed_bets['Profit/Loss'].sum()),
+        'sports': sports
+    }
+
+def merge_bet_summaries(summaries):
+    """Add up bet summaries"""
+    total = {'count': 0, 'stake': 0.0, 'profit': 0.0, 'sports': {}}
+    for summary in summaries:
+        for key in ('count', 'stake', 'profit'):
+            total[key] += summary[key]
+        for sport, stats in summary['sports'].items():
+            sport_total = total['sports'].setdefault(sport, {'count': 0, 'wins': 0, 'profit': 0.0})
+            for key in ('count', 'wins', 'profit'):
+                sport_total[key] += stats[key]
+    return total
+
+def summarize_transactions(df):
+    """Summarize transactions for the date filter"""
+    return {
+        'count': int(len(df)),
+        'first': df['Date'].min().strftime(ARCHIVE_DATE_FORMATS['transactions'])
+    }
+
+def combine_partitions(frames):
+    """Concatenate current and archived rows, skipping empty frames so column dtypes are kept"""
+    non_empty = [df for df in frames if not df.empty]
+    if not non_empty:
+        return frames[0]
+    return pd.concat(non_empty, ignore_index=True)
+
+# Immutable view of a user's data. Every update publishes a new snapshot, so
+# sessions can keep reading the one they started a run with. `archive` holds
+# only the month summaries; archived rows are loaded on demand.
+DatasetSnapshot = namedtuple('DatasetSnapshot', ['version', 'bets', 'transactions', 'bankroll', 'archive'])
+
+def append_rows(df, rows):
+    """Return a new DataFrame with rows appended.
+
+    Rows keep their ids, which are saved with them, so a bet picked from an
+    older snapshot or before a reload still refers to the same bet.
+    """
+    if df.empty:
+        return rows
+    return pd.concat([df, rows])
+
+def append_row(df, row):
+    """Return a new DataFrame with row appended under a new id"""
+    return append_rows(df, pd.DataFrame([row], index=[new_row_id()]))
+
+def copy_archive_summary(archive):
+    """Copy archive summaries deep enough to change individual months"""
+    return {key: dict(months) for key, months in archive.items()}
+
+class UserDataset:
+    """Process-wide betting data for one user, shared by all of their sessions.
+
+    Readers take `snapshot` and never modify its DataFrames. Writers go through
+    the methods below, which build new DataFrames (copy-on-write), persist them
+    and publish a new snapshot with a bumped version.
+    """
+
+    def __init__(self, username):
+        self.username = username
+        self._lock = get_user_lock(username)
+        with self._lock:
+            self._load(version=0)
+        self.compact()
+
+    def _load(self, version):
+        """Read the user's data from disk into a new snapshot. Caller holds the lock."""
+        # Recently used archive months, keyed by (kind, month), least recent first
+        self._archive_cache = OrderedDict()
+        self._compacted_month = None
+        # Set when a file couldn't be read. The archive is then left alone
+        # until a later reload succeeds, since empty data would be wrong.
+        self._load_failed = False
+        try:
+            bets = load_data(self.username)
+        except Exception as e:
+            st.error(f"Error loading data: {e}")
+            bets = pd.DataFrame(columns=[
+                'Date', 'Sport', 'Match', 'Bet Type', 'Stake', 'Odds', 'Result', 'Profit/Loss'
+            ])
+            self._load_failed = True
+        try:
+            transactions = load_transactions(self.username)
+        except Exception as e:
+            st.error(f"Error loading transactions: {e}")
+            transactions = pd.DataFrame(columns=[
+                'Date', 'Type', 'Amount', 'Balance_After', 'Note'
+            ])
+            self._load_failed = True
+        try:
+            archive = load_archive_summary(self.username)
+        except Exception as e:
+            st.error(f"Error loading archive summary: {e}")
+            archive = {'bets': {}, 'transactions': {}}
+            self._load_failed = True
+        self.snapshot = DatasetSnapshot(
+            version=version,
+            bets=bets,
+            transactions=transactions,
+            bankroll=get_user_bankroll(self.username),
+            archive=archive
+        )
+        if not self._load_failed:
+            self._recover_compaction()
+        self._file_stamps = self._read_file_stamps()
+
+    def _read_file_stamps(self):
+        """Get modification times of the files this dataset writes"""
+        files = [
+            get_user_file(self.username),
+            get_user_transactions_file(self.username),
+            get_user_bankroll_file(self.username),
+            get_user_archive_summary_file(self.username)
+        ]
+        return [os.stat(f).st_mtime_ns if os.path.exists(f) else None for f in files]
+
+    def _refresh(self):
+        """Reload if another dataset for this user wrote since we last did.
+
+        That happens when this dataset was evicted from the cache while a
+        session was still using it. Caller holds the lock.
+        """
+        if self._load_failed or self._read_file_stamps() != self._file_stamps:
+            self._load(version=self.snapshot.version + 1)
+
+    def _commit(self, bets=None, transactions=None, bankroll=None, archive=None):
+        """Persist changed parts and publish a new snapshot. Caller holds the lock.
+
+        If a save fails, the snapshot is reread from disk instead, so no
+        session is shown a change that wasn't saved.
+        """
+        saved = (
+            (bets is None or save_data(bets, self.username))
+            and (transactions is None or save_transactions(transactions, self.username))
+            and (bankroll is None or save_user_bankroll(self.username, bankroll))
+            and (archive is None or save_archive_summary(archive, self.username))
+        )
+        if not saved:
+            self._load(version=self.snapshot.version + 1)
+            return self.snapshot
+        return self._publish(bets, transactions, bankroll, archive)
+
+    def _publish(self, bets=None, transactions=None, bankroll=None, archive=None):
+        """Publish a new snapshot of already saved parts. Caller holds the lock."""
+        current = self.snapshot
+        self._file_stamps = self._read_file_stamps()
+        self.snapshot = DatasetSnapshot(
+            version=current.version + 1,
+            bets=current.bets if bets is None else bets,
+            transactions=current.transactions if transactions is None else transactions,
+            bankroll=current.bankroll if bankroll is None else bankroll,
+            archive=current.archive if archive is None else archive
+        )
+        return self.snapshot
+
+    def _load_partition(self, kind, month):
+        """Get one archive month, reading it from disk unless cached. Caller holds the lock.
+
+        Raises if the month can't be read; failures are not cached.
+        """
+        key = (kind, month)
+        if key in self._archive_cache:
+            self._archive_cache.move_to_end(key)
+            return self._archive_cache[key]
+        # The file is read even if the summary doesn't list the month, so
+        # its rows are never replaced by an empty partition
+        if month in self.snapshot.archive[kind] or os.path.exists(get_user_archive_file(self.username, kind, month)):
+            partition = load_archive_partition(self.username, kind, month)
+        else:
+            partition = pd.DataFrame()
+        self._cache_partition(kind, month, partition)
+        return partition
+
+    def _cache_partition(self, kind, month, partition):
+        """Remember an archive month, evicting the least recently used. Caller holds the lock."""
+        self._archive_cache[(kind, month)] = partition
+        self._archive_cache.move_to_end((kind, month))
+        while len(self._archive_cache) > ARCHIVE_CACHE_MONTHS:
+            self._archive_cache.popitem(last=False)
+
+    def _recover_compaction(self):
+        """Finish or undo a compaction that was interrupted. Caller holds the lock.
+
+        compact() marks the months it writes as pending before touching them.
+        If the current files still hold a pending month's rows they were never
+        saved without them, so the archive is cut back to its committed count.
+        Otherwise only the summary is missing and is rebuilt from the archive.
+        """
+        pending = self.snapshot.archive.get('pending')
+        if not pending:
+            return
+        archive = copy_archive_summary(self.snapshot.archive)
+        current_rows = {
+            'bets': self.snapshot.bets[self.snapshot.bets['Result'] != 'Pending'],
+            'transactions': self.snapshot.transactions
+        }
+        summarize = {'bets': summarize_bets, 'transactions': summarize_transactions}
+        unresolved = {}
+        for kind, months in pending.items():
+            current_months = set(get_months(current_rows[kind]))
+            for month, count in months.items():
+                try:
+                    if month in current_months:
+                        if os.path.exists(get_user_archive_file(self.username, kind, month)):
+                            partition = load_archive_partition(self.username, kind, month)
+                            committed = archive[kind][month]['count'] if month in archive[kind] else 0
+                            if not save_archive_partition(partition.iloc[:committed], self.username, kind, month):
+                                raise OSError("archive not saved")
+                    else:
+                        partition = load_archive_partition(self.username, kind, month)
+                        archive[kind][month] = summarize[kind](partition)
+                except Exception as e:
+                    st.error(f"Error recovering archive {kind} {month}: {e}")
+                    unresolved.setdefault(kind, {})[month] = count
+        if unresolved:
+            archive['pending'] = unresolved
+        else:
+            del archive['pending']
+        save_archive_summary(archive, self.username)
+        self.snapshot = self.snapshot._replace(archive=archive)
+
+    def compact(self):
+        """Move settled bets and transactions from past months into the archive.
+
+        The months being written are first marked pending in the summary,
+        then the archive months are written, then the current files, and
+        last the summary. _recover_compaction() picks up from any step.
+        """
+        month = get_current_month()
+        with self._lock:
+            self._refresh()
+            if self._load_failed or self._compacted_month == month:
+                return self.snapshot
+            self._compacted_month = month
+            current = self.snapshot
+            old_rows = {
+                'bets': current.bets[
+                    (current.bets['Result'] != 'Pending') & (get_months(current.bets) < month)
+                ],
+                'transactions': current.transactions[get_months(current.transactions) < month]
+            }
+            unresolved = current.archive.get('pending', {})
+            partitions = {}
+            archived_index = {'bets': [], 'transactions': []}
+            for kind, rows in old_rows.items():
+                for row_month, group in rows.groupby(get_months(rows)):
+                    if row_month in unresolved.get(kind, {}):
+                        continue
+                    try:
+                        partition = self._load_partition(kind, row_month)
+                    except Exception as e:
+                        # Leave these rows in the current files rather than overwrite the month
+                        st.error(f"Error loading archive {kind} {row_month}: {e}")
+                        continue
+                    partitions[(kind, row_month)] = append_rows(partition, group)
+                    archived_index[kind].extend(group.index)
+            if not partitions:
+                return current
+
+            archive = copy_archive_summary(current.archive)
+            archive['pending'] = {kind: dict(unresolved.get(kind, {})) for kind in old_rows}
+            for (kind, row_month), partition in partitions.items():
+                archive['pending'][kind][row_month] = int(len(partition))
+            bets = current.bets.drop(archived_index['bets'])
+            transactions = current.transactions.drop(archived_index['transactions'])
+            saved = (
+                save_archive_summary(archive, self.username)
+                and all(
+                    save_archive_partition(partition, self.username, kind, row_month)
+                    for (kind, row_month), partition in partitions.items()
+                )
+                and (not archived_index['bets'] or save_data(bets, self.username))
+                and (not archived_index['transactions'] or save_transactions(transactions, self.username))
+            )
+            if not saved:
+                # Reread from disk, which rolls the half-done compaction back
+                self._load(version=current.version + 1)
+                self._compacted_month = month
+                return self.snapshot
+
+            summarize = {'bets': summarize_bets, 'transactions': summarize_transactions}
+            for (kind, row_month), partition in partitions.items():
+                archive[kind][row_month] = summarize[kind](partition)
+                del archive['pending'][kind][row_month]
+                self._cache_partition(kind, row_month, partition)
+            archive['pending'] = {kind: months for kind, months in archive['pending'].items() if months}
+            if not archive['pending']:
+                del archive['pending']
+            save_archive_summary(archive, self.username)
+            return self._publish(
+                bets=bets if archived_index['bets'] else None,
+                transactions=transactions if archived_index['transactions'] else None,
+                archive=archive
+            )
+
+    def load_archive(self, kind, months):
+        """Load archived bets or transactions for the given months, as {month: DataFrame}"""
+        with self._lock:
+            partitions = {}
+            for month in sorted(months):
+                try:
+                    partitions[month] = self._load_partition(kind, month)
+                except Exception as e:
+                    st.error(f"Error loading archive {kind} {month}: {e}")
+            return partitions
+
+    def add_bet(self, bet):
+        """Add a new pending bet"""
+        bet = dict(bet, Date=pd.Timestamp(bet['Date']))
+        with self._lock:
+            self._refresh()
+            return self._commit(bets=append_row(self.snapshot.bets, bet))
+
+    def settle_bet(self, idx, result):
+        """Mark a pending bet as Win or Loss and update the bankroll"""
+        with self._lock:
+            self._refresh()
+            current = self.snapshot
+            if idx not in current.bets.index or current.bets.loc[idx, 'Result'] != 'Pending':
+                return current
+            bet = current.bets.loc[idx]
+            profit = calculate_profit(bet['Stake'], bet['Odds'], result)
+            bets = current.bets.copy()
+            bets.loc[idx, 'Result'] = result
+            bets.loc[idx, 'Profit/Loss'] = profit
+            if bet['Date'].strftime('%Y-%m') < get_current_month():
+                # Old bet is settled now, archive it on the next compact()
+                self._compacted_month = None
+            return self._commit(bets=bets, bankroll=current.bankroll + profit)
+
+    def delete_bet(self, idx):
+        """Delete a bet, refunding the stake if it was still pending"""
+        with self._lock:
+            self._refresh()
+            current = self.snapshot
+            if idx not in current.bets.index:
+                return current
+            bankroll = current.bankroll
+            if current.bets.loc[idx, 'Result'] == 'Pending':
+                bankroll += current.bets.loc[idx, 'Stake']
+            return self._commit(bets=current.bets.drop(idx), bankroll=bankroll)
+
+    def delete_archived_bet(self, month, idx):
+        """Delete a settled bet from an archive month"""
+        with self._lock:
+            self._refresh()
+            if self._load_failed:
+                return self.snapshot
+            try:
+                partition = self._load_partition('bets', month)
+            except Exception as e:
+                st.error(f"Error loading archive bets {month}: {e}")
+                return self.snapshot
+            if idx not in partition.index:
+                return self.snapshot
+            partition = partition.drop(idx)
+            if not save_archive_partition(partition, self.username, 'bets', month):
+                return self.snapshot
+            self._cache_partition('bets', month, partition)
+            archive = copy_archive_summary(self.snapshot.archive)
+            if partition.empty:
+                del archive['bets'][month]
+            else:
+                archive['bets'][month] = summarize_bets(partition)
+            return self._commit(archive=archive)
+
+    def add_transaction(self, transaction_type, amount, note):
+        """Record a deposit or withdrawal. Raises ValueError on insufficient funds."""
+        with self._lock:
+            self._refresh()
+            current = self.snapshot
+            if transaction_type == "Withdraw":
+                if amount > current.bankroll:
+                    raise ValueError("Insufficient funds!")
+                bankroll = current.bankroll - amount
+            else:
+                bankroll = current.bankroll + amount
+            transactions = append_row(current.transactions, {
+                'Date': pd.Timestamp(datetime.now()),
+                'Type': transaction_type,
+                'Amount': amount,
+                'Balance_After': bankroll,
+                'Note': note if note else '-'
+            })
+            return self._commit(transactions=transactions, bankroll=bankroll)
+
+# How often an open page checks whether another session changed the data
+DATA_REFRESH_SECONDS = 5
+
+@st.cache_resource(show_spinner=False)
+def get_user_lock(username):
+    """Get the lock serializing writes to this user's files.
+
+    Kept apart from the dataset so an evicted dataset and its replacement
+    still take turns.
+    """
+    return threading.Lock()
+
+# Idle users are dropped after an hour and at most 100 are kept in memory.
+# They are reloaded from disk on their next visit.
+@st.cache_resource(show_spinner=False, ttl=3600, max_entries=100)
+def get_user_dataset(username):
+    """Get the dataset shared by every session of this user"""
+    return UserDataset(username)
+
+@st.fragment(run_every=DATA_REFRESH_SECONDS)
+def watch_user_dataset(username):
+    """Rerun the page when another session has changed the shared data"""
+    if get_user_dataset(username).snapshot.version != st.session_state.get('data_version'):
+        st.rerun()
+
+def sync_session_version(snapshot):
+    """Tell the session when another session has changed the shared data"""
+    seen = st.session_state.get('data_version')
+    if seen is not None and seen != snapshot.version:
+        st.toast("Data was updated in another session")
+    st.session_state.data_version = snapshot.version
+
+def publish_session_version(snapshot):
+    """Record a version produced by this session so it is not reported as external"""
+    st.session_state.data_version = snapshot.version
+
 def save_session_state(username):
     """Save session state to file"""
     try:
@@ -186,16 +778,12 @@ def login_page():
             submitted = st.form_submit_button("Login")
             
             if submitted:
-                users = load_users()
-                if username in users and check_password(password, users[username]):
+                hashed_password = get_user_password(username)
+                if hashed_password and check_password(password, hashed_password):
                     st.session_state['logged_in'] = True
                     st.session_state['username'] = username
                     # Save session state
                     save_session_state(username)
-                    # Load user data
-                    st.session_state.transactions = load_transactions(username)
-                    st.session_state.bets = load_data(username)
-                    st.session_state.bankroll = get_user_bankroll(username)
                     st.rerun()
                 else:
                     st.error("Invalid username or password")
@@ -213,19 +801,16 @@ def login_page():
                     st.error("Passwords don't match")
                     return
                 
-                users = load_users()
-                if new_username in users:
+                try:
+                    registered = register_user(new_username, make_hashed_password(new_password))
+                except OSError as e:
+                    st.error(f"Error saving user: {e}")
+                    return
+                if not registered:
                     st.error("Username already exists")
                     return
                 
-                users[new_username] = make_hashed_password(new_password)
-                save_users(users)
-                save_user_bankroll(new_username, initial_bankroll)
-                # Initialize empty transactions for new user
-                empty_transactions = pd.DataFrame(columns=[
-                    'Date', 'Type', 'Amount', 'Balance_After', 'Note'
-                ])
-                save_transactions(empty_transactions, new_username)
+                init_user_data(new_username, initial_bankroll)
                 st.success("Registration successful! Please login.")
 
 def calculate_profit(stake, odds, result):
@@ -238,6 +823,8 @@ def calculate_profit(stake, odds, result):
 
 # Main Application Function
 def main():
+    prepare_user_registry()
+    
     # Check for existing session
     if 'logged_in' not in st.session_state:
         session_data = load_session_state()
@@ -245,9 +832,6 @@ def main():
             username = session_data['username']
             st.session_state['logged_in'] = True
             st.session_state['username'] = username
-            st.session_state.transactions = load_transactions(username)
-            st.session_state.bets = load_data(username)
-            st.session_state.bankroll = get_user_bankroll(username)
         else:
             st.session_state['logged_in'] = False
 
@@ -257,28 +841,21 @@ def main():
 
     # Add logout button
     if st.sidebar.button("Logout"):
-        # Save all data before logging out
-        save_transactions(st.session_state.transactions, st.session_state['username'])
-        save_data(st.session_state.bets, st.session_state['username'])
-        save_user_bankroll(st.session_state['username'], st.session_state.bankroll)
-        
+        # Data is saved on every change, so only the session needs clearing
         # Remove session file
         if os.path.exists('session_state.json'):
             os.remove('session_state.json')
             
         st.session_state['logged_in'] = False
         st.session_state['username'] = None
+        st.session_state.pop('data_version', None)
         st.rerun()
 
-    # Initialize session states
-    if 'transactions' not in st.session_state:
-        st.session_state.transactions = load_transactions(st.session_state['username'])
-    
-    if 'bets' not in st.session_state:
-        st.session_state.bets = load_data(st.session_state['username'])
-    
-    if 'bankroll' not in st.session_state:
-        st.session_state.bankroll = get_user_bankroll(st.session_state['username'])
+    # Shared data for this user, read from one snapshot for the whole run
+    dataset = get_user_dataset(st.session_state['username'])
+    data = dataset.compact()
+    sync_session_version(data)
+    watch_user_dataset(st.session_state['username'])
     
     if 'confirm_delete' not in st.session_state:
         st.session_state.confirm_delete = None
@@ -296,49 +873,21 @@ def main():
         note = st.text_input("Note (optional)")
         
         if st.button("Process Transaction"):
-            if action == "Deposit":
-                st.session_state.bankroll += amount
-                transaction_type = "Deposit"
+            try:
+                publish_session_version(dataset.add_transaction(action, amount, note))
+            except ValueError as e:
+                st.error(str(e))
             else:
-                if amount > st.session_state.bankroll:
-                    st.error("Insufficient funds!")
-                    st.rerun()
-                st.session_state.bankroll -= amount
-                transaction_type = "Withdraw"
-            
-            # Create new transaction
-            new_transaction = pd.DataFrame([{
-                'Date': datetime.now(),
-                'Type': transaction_type,
-                'Amount': amount,
-                'Balance_After': st.session_state.bankroll,
-                'Note': note if note else '-'
-            }])
-            
-            # Initialize transactions if not exists
-            if 'transactions' not in st.session_state:
-                st.session_state.transactions = pd.DataFrame(columns=[
-                    'Date', 'Type', 'Amount', 'Balance_After', 'Note'
-                ])
-            
-            # Add new transaction
-            st.session_state.transactions = pd.concat([
-                st.session_state.transactions, new_transaction
-            ], ignore_index=True)
-            
-            # Save changes
-            save_user_bankroll(st.session_state['username'], st.session_state.bankroll)
-            save_transactions(st.session_state.transactions, st.session_state['username'])
-            st.success(f"{transaction_type} processed successfully!")
-            st.rerun()
+                st.success(f"{action} processed successfully!")
+                st.rerun()
 
     # Calculate available balance
-    pending_bets = st.session_state.bets[st.session_state.bets['Result'] == 'Pending']
+    pending_bets = data.bets[data.bets['Result'] == 'Pending']
     pending_stakes = pending_bets['Stake'].sum()
-    available_balance = st.session_state.bankroll
+    available_balance = data.bankroll
     
     # Display balances
-    st.sidebar.metric("Current Bankroll", f"RM{st.session_state.bankroll:.2f}")
+    st.sidebar.metric("Current Bankroll", f"RM{data.bankroll:.2f}")
     st.sidebar.metric("Available Balance", f"RM{available_balance:.2f}")
     
     
@@ -383,7 +932,7 @@ def main():
                         st.error("Insufficient available balance!")
                         return
                         
-                    new_bet = pd.DataFrame([{
+                    new_bet = {
                         'Date': date,
                         'Sport': sport,
                         'Match': match,
@@ -392,11 +941,10 @@ def main():
                         'Odds': odds,
                         'Result': 'Pending',
                         'Profit/Loss': 0
-                    }])
+                    }
                     
                     # Don't deduct from bankroll when placing bet, only when losing
-                    st.session_state.bets = pd.concat([st.session_state.bets, new_bet], ignore_index=True)
-                    save_data(st.session_state.bets, st.session_state['username'])
+                    publish_session_version(dataset.add_bet(new_bet))
                     st.success("✅ Bet added successfully!")
                     st.rerun()
         
@@ -479,7 +1027,7 @@ def main():
                         [f"{p['Sport']}: {p['Match']} ({p['Bet Type']})" for p in picks]
                     )
                     
-                    new_bet = pd.DataFrame([{
+                    new_bet = {
                         'Date': date,
                         'Sport': "Parlay",
                         'Match': parlay_description,
@@ -488,10 +1036,9 @@ def main():
                         'Odds': total_odds,
                         'Result': 'Pending',
                         'Profit/Loss': 0
-                    }])
+                    }
                     
-                    st.session_state.bets = pd.concat([st.session_state.bets, new_bet], ignore_index=True)
-                    save_data(st.session_state.bets, st.session_state['username'])
+                    publish_session_version(dataset.add_bet(new_bet))
                     st.success("✅ Parlay added successfully!")
 # Tab 2: Update Results
     with tab2:
@@ -511,24 +1058,15 @@ def main():
                     col1, col2 = st.columns(2)
                     with col1:
                         if st.button("🎉 Win", key=f"win_{idx}"):
-                            profit = calculate_profit(bet['Stake'], bet['Odds'], 'Win')
-                            st.session_state.bets.loc[idx, 'Result'] = 'Win'
-                            st.session_state.bets.loc[idx, 'Profit/Loss'] = profit
                             # Update bankroll with profit only (stake already counted in bankroll)
-                            st.session_state.bankroll += profit
-                            save_data(st.session_state.bets, st.session_state['username'])
-                            save_user_bankroll(st.session_state['username'], st.session_state.bankroll)
+                            publish_session_version(dataset.settle_bet(idx, 'Win'))
                             st.success("Updated as Win!")
                             st.rerun()
     
                     with col2:
                         if st.button("❌ Loss", key=f"loss_{idx}"):
-                            st.session_state.bets.loc[idx, 'Result'] = 'Loss'
-                            st.session_state.bets.loc[idx, 'Profit/Loss'] = -bet['Stake']
                             # Update bankroll by removing stake
-                            st.session_state.bankroll -= bet['Stake']
-                            save_data(st.session_state.bets, st.session_state['username'])
-                            save_user_bankroll(st.session_state['username'], st.session_state.bankroll)
+                            publish_session_version(dataset.settle_bet(idx, 'Loss'))
                             st.success("Updated as Loss!")
                             st.rerun()
 
@@ -536,14 +1074,17 @@ def main():
     with tab3:
         st.subheader("🗑️ Delete Bets")
         
-        if st.session_state.bets.empty:
+        if data.bets.empty and not data.archive['bets']:
             st.info("No bets to manage")
         else:
-            display_df = st.session_state.bets.copy()
-            display_df['Date'] = pd.to_datetime(display_df['Date'])
-            display_df = display_df.sort_values('Date', ascending=False)
+            partitions = {'current': data.bets}
+            if data.archive['bets'] and st.checkbox("Include archived bets", key="manage_archived"):
+                partitions.update(dataset.load_archive('bets', data.archive['bets']))
+            partitions = {name: df for name, df in partitions.items() if not df.empty} or {'current': data.bets}
+            display_df = pd.concat(partitions).sort_values('Date', ascending=False)
 
-            for idx, bet in display_df.iterrows():
+            for (partition, bet_idx), bet in display_df.iterrows():
+                idx = f"{partition}_{bet_idx}"
                 with st.expander(f"{bet['Match']} - {bet['Date'].strftime('%Y-%m-%d')} ({bet['Sport']})"):
                     col1, col2 = st.columns([3, 1])
                     
@@ -559,11 +1100,10 @@ def main():
                         # Two-step deletion process
                         if st.session_state.confirm_delete == idx:
                             if st.button("❗ Confirm Delete", key=f"confirm_{idx}"):
-                                if bet['Result'] == 'Pending':
-                                    st.session_state.bankroll += bet['Stake']
-                                st.session_state.bets = st.session_state.bets.drop(idx)
-                                save_data(st.session_state.bets, st.session_state['username'])
-                                save_user_bankroll(st.session_state['username'], st.session_state.bankroll)
+                                if partition == 'current':
+                                    publish_session_version(dataset.delete_bet(bet_idx))
+                                else:
+                                    publish_session_version(dataset.delete_archived_bet(partition, bet_idx))
                                 st.session_state.confirm_delete = None
                                 st.success("Bet deleted successfully!")
                                 st.rerun()
@@ -581,17 +1121,25 @@ def main():
     with tab4:
         st.subheader("💰 Transaction History")
         
-        if 'transactions' not in st.session_state or st.session_state.transactions.empty:
+        if data.transactions.empty and not data.archive['transactions']:
             st.info("No transactions yet")
         else:
             # Add filters
             col1, col2 = st.columns(2)
             with col1:
-                start_date = st.session_state.transactions['Date'].min().date()
-                end_date = st.session_state.transactions['Date'].max().date()
+                # Default to the current transactions so archived months are only
+                # read once the range is widened to reach them
+                if data.transactions.empty:
+                    start_date = datetime.now().date().replace(day=1)
+                    end_date = datetime.now().date()
+                else:
+                    start_date = data.transactions['Date'].min().date()
+                    end_date = data.transactions['Date'].max().date()
+                first_dates = [pd.Timestamp(s['first']).date() for s in data.archive['transactions'].values()]
                 date_range = st.date_input(
                     "Select Date Range",
-                    [start_date, end_date]
+                    [start_date, end_date],
+                    min_value=min(first_dates + [start_date])
                 )
             
             with col2:
@@ -601,13 +1149,23 @@ def main():
                     ["Deposit", "Withdraw"]
                 )
             
+            # Load only the archived months the date range reaches into
+            months = [
+                month for month in data.archive['transactions']
+                if date_range[0].strftime('%Y-%m') <= month <= date_range[1].strftime('%Y-%m')
+            ]
+            transactions = combine_partitions(
+                [data.transactions, *dataset.load_archive('transactions', months).values()]
+            )
+            
             # Apply filters
+            transaction_dates = pd.to_datetime(transactions['Date']).dt.date
             mask = (
-                (st.session_state.transactions['Date'].dt.date >= date_range[0]) &
-                (st.session_state.transactions['Date'].dt.date <= date_range[1]) &
-                (st.session_state.transactions['Type'].isin(transaction_type))
+                (transaction_dates >= date_range[0]) &
+                (transaction_dates <= date_range[1]) &
+                (transactions['Type'].isin(transaction_type))
             )
-            filtered_df = st.session_state.transactions[mask]
+            filtered_df = transactions[mask]
 
             # Display summary metrics
             col1, col2, col3 = st.columns(3)
@@ -628,9 +1186,8 @@ def main():
             st.subheader("Transaction Details")
             
             # Format the DataFrame for display
-            display_df = filtered_df.copy()
-            display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d %H:%M')
-            display_df = display_df.sort_values('Date', ascending=False)
+            display_df = filtered_df.sort_values('Date', ascending=False)
+            display_df = display_df.assign(Date=pd.to_datetime(display_df['Date']).dt.strftime('%Y-%m-%d %H:%M'))
             
             # Style the DataFrame
             st.dataframe(
@@ -654,18 +1211,19 @@ def main():
 
 
     # Display Summary Statistics
-    if not st.session_state.bets.empty:
+    if not data.bets.empty or data.archive['bets']:
         st.header("📈 Summary Statistics")
         
         col1, col2, col3, col4 = st.columns(4)
         
-        completed_bets = st.session_state.bets[st.session_state.bets['Result'] != 'Pending']
-        total_profit = completed_bets['Profit/Loss'].sum()
-        total_stake = completed_bets['Stake'].sum()
+        # Archived months are counted from their summaries, not their rows
+        summary = merge_bet_summaries([summarize_bets(data.bets), *data.archive['bets'].values()])
+        total_profit = summary['profit']
+        total_stake = summary['stake']
         roi = (total_profit / total_stake * 100) if total_stake > 0 else 0
         
         with col1:
-            st.metric("🎯 Total Bets", len(st.session_state.bets))
+            st.metric("🎯 Total Bets", summary['count'])
         with col2:
             st.metric("💵 Total Stake", f"RM{total_stake:.2f}")
         with col3:
@@ -675,27 +1233,34 @@ def main():
         
         # Sport-wise breakdown
         st.subheader("🏆 Sport-wise Performance")
-        sport_stats = completed_bets.groupby('Sport').agg({
-            'Profit/Loss': 'sum',
-            'Result': lambda x: (x == 'Win').sum() / len(x) * 100 if len(x) > 0 else 0
+        sport_stats = pd.DataFrame.from_dict(
+            summary['sports'], orient='index', columns=['count', 'wins', 'profit']
+        ).sort_index()
+        sport_stats = pd.DataFrame({
+            'Profit/Loss (RM)': sport_stats['profit'],
+            'Win Rate (%)': sport_stats['wins'] / sport_stats['count'] * 100
         }).round(2)
-        sport_stats.columns = ['Profit/Loss (RM)', 'Win Rate (%)']
+        sport_stats.index.name = 'Sport'
         st.dataframe(sport_stats)
         
         # Display all bets with proper date sorting
         st.header("📚 All Bets History")
-        display_df = st.session_state.bets.copy()
-        display_df['Date'] = pd.to_datetime(display_df['Date'])
-        display_df = display_df.sort_values('Date', ascending=False)
-        display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d')
+        all_bets = data.bets
+        if data.archive['bets'] and st.checkbox("Include archived bets", key="history_archived"):
+            all_bets = combine_partitions(
+                [data.bets, *dataset.load_archive('bets', data.archive['bets']).values()]
+            )
+        display_df = all_bets.sort_values('Date', ascending=False)
+        display_df = display_df.assign(Date=pd.to_datetime(display_df['Date']).dt.strftime('%Y-%m-%d'))
         st.dataframe(display_df, use_container_width=True)
         
         # Add backup capability
         if st.button("📥 Backup Data"):
             backup_filename = f"betting_history_backup_{st.session_state['username']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df_to_save = st.session_state.bets.copy()
-            df_to_save['Date'] = pd.to_datetime(df_to_save['Date']).dt.strftime('%Y-%m-%d')
-            df_to_save.to_csv(backup_filename, index=False)
+            all_bets = combine_partitions(
+                [data.bets, *dataset.load_archive('bets', data.archive['bets']).values()]
+            )
+            all_bets.to_csv(backup_filename, index=False, date_format='%Y-%m-%d')
             st.success(f"✅ Data backed up to {backup_filename}!")
 
     # Add extra space at bottom